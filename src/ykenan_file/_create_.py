@@ -1,10 +1,29 @@
 #!/usr/bin/env python3
 # -*- coding: UTF-8 -*-
 
+import codecs
+import logging
+import os
+from functools import reduce
+
+import numpy as np
 import pandas as pd
 from ykenan_log import Logger
 from pandas import DataFrame
 
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    is_pyarrow: bool = True
+except ImportError:
+    is_pyarrow: bool = False
+
+try:
+    import xlsxwriter  # noqa: F401
+    is_xlsxwriter: bool = True
+except ImportError:
+    is_xlsxwriter: bool = False
+
 '''
  * @Author       : YKenan
  * @Description  : file Create
@@ -46,22 +65,74 @@ class Create:
         self.header = header
         self.sheet_name = sheet_name
 
-    def to_file(self, df: DataFrame, file: str) -> None:
+    def _write_arrow(self, df: DataFrame, file: str, sep: str) -> bool:
         """
+        Write integer and string columns with the pyarrow CSV writer
         :param df: DataFrame
         :param file: File path plus name
+        :param sep: File Separator
+        :return: Whether the file was written
         """
-        self.log.debug(f"create a file: {file}")
-        # 导出文件
-        if str(file).endswith(".txt") or str(file).endswith(".bed") or str(file).endswith(".tsv"):
+        encoding: str = codecs.lookup(self.encoding).name
+        # 单列时 pandas 将空值写为 "", pyarrow 写为空行 (读取时会被跳过)
+        if not is_pyarrow or len(df) <= 10000 or df.shape[1] == 1 or not df.columns.is_unique or self.index or len(sep) != 1 or self.line_terminator != "\n" or encoding not in ("utf-8", "utf-8-sig"):
+            return False
+        # 浮点数, 布尔值和时间的格式与 pandas 不同, 只处理整数和字符串
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        except pa.ArrowException:
+            return False
+        if not all(pa.types.is_integer(type_) or pa.types.is_string(type_) or pa.types.is_large_string(type_) for type_ in table.schema.types):
+            return False
+        try:
+            with open(file, 'wb') as f:
+                if encoding == "utf-8-sig":
+                    f.write(codecs.BOM_UTF8)
+                f.write(df.iloc[:0].to_csv(sep=sep, lineterminator="\n", header=self.header, index=False).encode("utf-8"))
+                pa_csv.write_csv(table, f, write_options=pa_csv.WriteOptions(include_header=False, delimiter=sep, quoting_style="none"))
+        except pa.ArrowInvalid:
+            # 内容中含有需要引号的字符
+            return False
+        return True
+
+    def _write_text(self, df: DataFrame, file: str) -> None:
+        if not self._write_arrow(df, file, self.sep):
             df.to_csv(file, sep=self.sep, lineterminator=self.line_terminator, header=self.header, encoding=self.encoding, index=self.index)
-        elif str(file).endswith(".csv"):
+
+    def _write_csv(self, df: DataFrame, file: str) -> None:
+        if not self._write_arrow(df, file, ','):
             df.to_csv(file, sep=',', lineterminator=self.line_terminator, header=self.header, encoding=self.encoding, index=self.index)
-        elif str(file).endswith(".xls") or str(file).endswith(".xlsx"):
-            df.to_excel(file, sheet_name=self.sheet_name, header=self.header, index=self.index)
+
+    def _write_excel(self, df: DataFrame, file: str) -> None:
+        if is_xlsxwriter and file.lower().endswith(".xlsx"):
+            with pd.ExcelWriter(file, engine="xlsxwriter") as writer:
+                df.to_excel(writer, sheet_name=self.sheet_name, header=self.header, index=self.index)
         else:
-            with open(file, 'w', encoding='UTF-8') as f:
-                df.to_string(f)
+            df.to_excel(file, sheet_name=self.sheet_name, header=self.header, index=self.index)
+
+    def _write_string(self, df: DataFrame, file: str) -> None:
+        with open(file, 'w', encoding='UTF-8') as f:
+            df.to_string(f)
+
+    # 文件后缀对应的导出方法
+    _writers: dict = {
+        ".txt": _write_text,
+        ".bed": _write_text,
+        ".tsv": _write_text,
+        ".csv": _write_csv,
+        ".xls": _write_excel,
+        ".xlsx": _write_excel
+    }
+
+    def to_file(self, df: DataFrame, file: str) -> None:
+        """
+        :param df: DataFrame
+        :param file: File path plus name
+        """
+        self.log.debug(f"create a file: {file}")
+        # 导出文件
+        file = os.fspath(file)
+        self._writers.get(os.path.splitext(file)[1].lower(), Create._write_string)(self, df, file)
 
     def rename(self, df: DataFrame, columns: list, output_file: str = None) -> None:
         """
@@ -106,13 +177,36 @@ class Create:
         # 添加内容
         if columns is None:
             columns: list = list(df.columns)
-        if is_log:
+        # 逐行添加时调用频繁, debug 不输出时不格式化内容
+        if is_log and self.log.log.isEnabledFor(logging.DEBUG):
             self.log.debug(f"Add content {list_content} ...")
         df.loc[len(df)] = pd.Series(list_content, index=columns)
         # 保存文件
         if output_file is not None:
             self.to_file(df, output_file)
 
+    def add_contents(self, df: DataFrame, rows: list, columns=None, is_log: bool = False, output_file: str = None) -> DataFrame:
+        """
+        Add multiple rows of content to the created file at once
+        :param df: DataFrame
+        :param rows: Multiple rows of content, each row in array form
+        :param columns: column information
+        :param output_file: Output file path
+        :param is_log: Do you want to print the log
+        :return: DataFrame with the added content
+        """
+        # 添加内容
+        if columns is None:
+            columns: list = list(df.columns)
+        if is_log:
+            self.log.debug(f"Add {len(rows)} rows of content ...")
+        # 一次构建全部行, 避免逐行添加带来的重复内存分配
+        new_df = pd.concat([df, pd.DataFrame(rows, columns=columns)], ignore_index=True)
+        # 保存文件
+        if output_file is not None:
+            self.to_file(new_df, output_file)
+        return new_df
+
     def add_difference_column(self, df: DataFrame, column: str, a: str, b: str, output_file: str = None) -> None:
         """
         Add a subtraction column (column=a - b)
@@ -124,7 +218,11 @@ class Create:
         :return:
         """
         self.log.debug(f"Add a subtraction column: {column}")
-        df[column] = df[a] - df[b]
+        # 同一个 DataFrame 的两列无需索引对齐, 数值列直接使用 numpy 相减
+        if all(isinstance(df[name].dtype, np.dtype) and df[name].dtype.kind in "iufc" for name in (a, b)):
+            df[column] = np.subtract(df[a].to_numpy(copy=False), df[b].to_numpy(copy=False))
+        else:
+            df[column] = df[a] - df[b]
         # 保存文件
         if output_file is not None:
             self.to_file(df, output_file)
@@ -139,9 +237,49 @@ class Create:
         :return:
         """
         self.log.debug(f"添加五个 rank 列: {group}, {column}")
-        # 添加排名
-        for method in ['average', 'min', 'max', 'dense', 'first']:
-            df[f'{method}_rank'] = df.groupby(group)[column].rank(method)
+        dtype = df[column].dtype
+        if not (isinstance(dtype, np.dtype) and dtype.kind in "biufmM"):
+            # 分类, 可空整数等扩展类型的排序和结果类型与 numpy 不同, 使用 pandas 排名
+            for method in ['average', 'min', 'max', 'dense', 'first']:
+                df[f'{method}_rank'] = df.groupby(group)[column].rank(method)
+        else:
+            # 分组编号只计算一次 (缺失的分组为 -1)
+            codes = df.groupby(group, sort=False, observed=True).ngroup().to_numpy()
+            values = df[column].to_numpy()
+            # 缺失的分组或值不参与排名
+            valid = np.flatnonzero((codes >= 0) & ~pd.isna(values))
+            # 一次排序: 先按分组, 再按值, 相同值保持原有顺序
+            order = valid[np.lexsort((values[valid], codes[valid]))]
+            sorted_codes = codes[order]
+            sorted_values = values[order]
+            size = len(order)
+            positions = np.arange(size)
+            # 分组的开始位置和相同值的开始, 结束位置
+            group_start = np.ones(size, dtype=bool)
+            group_start[1:] = sorted_codes[1:] != sorted_codes[:-1]
+            tie_start = group_start.copy()
+            tie_start[1:] |= sorted_values[1:] != sorted_values[:-1]
+            tie_end = np.ones(size, dtype=bool)
+            tie_end[:-1] = tie_start[1:]
+            group_first = np.maximum.accumulate(np.where(group_start, positions, 0))
+            tie_first = np.maximum.accumulate(np.where(tie_start, positions, 0))
+            tie_last = np.minimum.accumulate(np.where(tie_end, positions, size)[::-1])[::-1]
+            tie_count = np.cumsum(tie_start)
+            # 由同一次排序推导五种排名
+            min_rank = tie_first - group_first + 1
+            max_rank = tie_last - group_first + 1
+            sorted_ranks: dict = {
+                'average': (min_rank + max_rank) / 2,
+                'min': min_rank,
+                'max': max_rank,
+                'dense': tie_count - tie_count[group_first] + 1,
+                'first': positions - group_first + 1
+            }
+            # 添加排名
+            for method, sorted_rank in sorted_ranks.items():
+                rank = np.full(len(df), np.nan)
+                rank[order] = sorted_rank
+                df[f'{method}_rank'] = rank
         # 保存文件
         if output_file is not None:
             self.to_file(df, output_file)
@@ -198,63 +336,17 @@ class Create:
         """
         # 总和
         self.log.debug(f"Performing a series of numerical calculations through grouping: {group}, {column}")
-        # 个数大小
-        column_size = df.groupby(group)[column].size().reset_index()
-        new_column = group.copy()
-        new_column.append(f"{column}_size")
-        column_size.columns = new_column
-        # 平均值
-        column_mean = df.groupby(group)[column].mean().reset_index()
-        new_column = group.copy()
-        new_column.append(f"{column}_mean")
-        column_mean.columns = new_column
-        # 方差 (size == 1 的值为 NaN)
-        column_var = df.groupby(group)[column].var().reset_index()
-        new_column = group.copy()
-        new_column.append(f"{column}_var")
-        column_var.columns = new_column
-        # 标准误差 (size == 1 的值为 NaN)
-        column_sem = df.groupby(group)[column].sem().reset_index()
-        new_column = group.copy()
-        new_column.append(f"{column}_sem")
-        column_sem.columns = new_column
-        # 标准偏差 (size == 1 的值为 NaN)
-        column_std = df.groupby(group)[column].std().reset_index()
-        new_column = group.copy()
-        new_column.append(f"{column}_std")
-        column_std.columns = new_column
-        # 中位数值
-        column_median = df.groupby(group)[column].median().reset_index()
-        new_column = group.copy()
-        new_column.append(f"{column}_median")
-        column_median.columns = new_column
-        # 最小值
-        column_min = df.groupby(group)[column].min().reset_index()
-        new_column = group.copy()
-        new_column.append(f"{column}_min")
-        column_min.columns = new_column
-        # 最大值
-        column_max = df.groupby(group)[column].max().reset_index()
-        new_column = group.copy()
-        new_column.append(f"{column}_max")
-        column_max.columns = new_column
-        # 总和
-        column_sum = self.sum_group_by(df, group, column)
-        # 乘积
-        column_prod = df.groupby(group)[column].prod().reset_index()
-        new_column = group.copy()
-        new_column.append(f"{column}_prod")
-        column_prod.columns = new_column
+        # 一次分组完成全部计算: 个数大小, 平均值, 方差, 标准误差, 标准偏差, 中位数值, 最小值, 最大值, 总和, 乘积 (var, sem, std 中 size == 1 的值为 NaN)
+        calculations: list = ['size', 'mean', 'var', 'sem', 'std', 'median', 'min', 'max', 'sum', 'prod']
+        column_calculation = df.groupby(group, sort=False, observed=True)[column].agg(calculations).reset_index()
+        column_calculation.columns = group + [f"{column}_{calculation}" for calculation in calculations]
+        # 合并添加的文件
+        if add_merge_files is not None:
+            column_calculation = self.merge_files([column_calculation, *add_merge_files], on=on)
         # 保存文件
-        all_merge_files: list = [column_size, column_mean, column_var, column_sem, column_std,
-                                 column_median, column_min, column_max, column_sum, column_prod]
-
         if output_file is not None:
-            if add_merge_files is not None:
-                all_merge_files.extend(add_merge_files)
-                return self.merge_files(all_merge_files, on=on, output_file=output_file)
-            else:
-                return self.merge_files(all_merge_files, on=on, output_file=output_file)
+            self.to_file(column_calculation, output_file)
+        return column_calculation
 
     def merge_files(self, files: list, on: str, output_file: str = None) -> DataFrame:
         """
@@ -267,12 +359,17 @@ class Create:
         # 总和
         size = len(files)
         self.log.debug(f"Merge files: {size}, {on}")
-        new_file = files[0]
-        i = 1
-        while i < size:
-            self.log.debug(f"Merge files {i} 次")
-            new_file = pd.merge(new_file, files[i], on=on)
-            i += 1
+        keys: list = [on] if isinstance(on, str) else list(on)
+        indexed_files: list = [file.set_index(on) for file in files]
+        columns: list = [column for file in indexed_files for column in file.columns]
+        # key 类型不同时需要 pd.merge 的类型检查和结果类型
+        key_dtypes: set = {tuple(file[key].dtype for key in keys) for file in files}
+        if len(key_dtypes) == 1 and all(file.index.is_unique for file in indexed_files) and len(columns) == len(set(columns)):
+            # 以 on 作为索引, 一次对齐全部文件
+            new_file = pd.concat(indexed_files, axis=1, join='inner').reset_index()
+        else:
+            # key 类型不同, key 重复或列名重复时逐个合并
+            new_file = reduce(lambda left, right: pd.merge(left, right, on=on), files)
         # 保存文件
         if output_file is not None:
             self.to_file(new_file, output_file)
@@ -1,12 +1,21 @@
 #!/usr/bin/env python3
 # -*- coding: UTF-8 -*-
 
+import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import Sequence, Literal
 
 import pandas as pd
 from pandas import DataFrame
 from ykenan_log import Logger
 
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    is_pyarrow: bool = True
+except ImportError:
+    is_pyarrow: bool = False
+
 '''
  * @Author       : YKenan
  * @Description  : file Read
@@ -30,7 +39,9 @@ class Read:
         low_memory: bool = False,
         log_file: str = "YKenan_file",
         is_verbose: bool = False,
-        is_form_log_file: bool = False
+        is_form_log_file: bool = False,
+        use_arrow: bool = False,
+        parallel: bool = True
     ):
         """
         Read file initialization information, public information
@@ -45,6 +56,8 @@ class Read:
         :param log_file: Path to form a log file
         :param is_verbose: Is log information displayed
         :param is_form_log_file: Is a log file formed
+        :param use_arrow: Use the multithreaded pyarrow engine to parse text files when pyarrow is installed (large integers may lose precision and date columns are parsed as dates)
+        :param parallel: Read multiple files in parallel threads
         """
         self.log = Logger(name="YKenan_file", log_path=log_file, is_form_file=is_form_log_file)
         self.sep = sep
@@ -56,6 +69,52 @@ class Read:
         self.is_verbose = is_verbose
         self.sheet_name = sheet_name
         self.low_memory = low_memory
+        self.use_arrow = use_arrow
+        self.parallel = parallel
+        # Excel 只支持整数表头行
+        self.excel_header = header if isinstance(header, int) else 0
+
+    def read_text(self, file: str, sep: str) -> DataFrame:
+        """
+        Read delimited text file content
+        :param file: File path information
+        :param sep: file separator
+        :return:
+        """
+        # pyarrow 引擎仅支持单字符分隔符和单行表头, 其余情况使用 C 引擎
+        if self.use_arrow and is_pyarrow and len(sep) == 1 and (self.header is None or self.header == "infer" or isinstance(self.header, int)):
+            content = pd.read_csv(file, sep=sep, header=self.header, encoding=self.encoding, engine="pyarrow")
+            # pyarrow 引擎不会重命名重复的列名
+            if content.columns.is_unique:
+                return content
+        return pd.read_csv(file, sep=sep, header=self.header, encoding=self.encoding, low_memory=self.low_memory)
+
+    def read_bed(self, file: str) -> DataFrame:
+        """
+        Read BED file content without a header, the first three columns are chrom, start and end
+        (chrom is returned as category, other columns match a headerless `pd.read_csv`)
+        :param file: File path information
+        :return:
+        """
+        # 固定前三列的类型, 跳过类型推断, chrom 使用字典编码 (category)
+        table = pa_csv.read_csv(
+            file,
+            read_options=pa_csv.ReadOptions(autogenerate_column_names=True, encoding=self.encoding, block_size=8 << 20),
+            parse_options=pa_csv.ParseOptions(delimiter=self.sep),
+            convert_options=pa_csv.ConvertOptions(
+                column_types={"f0": pa.dictionary(pa.int32(), pa.string()), "f1": pa.int64(), "f2": pa.int64()},
+                strings_can_be_null=True
+            )
+        )
+        # pandas 不解析日期和时间, 此时使用 C 引擎读取
+        if any(pa.types.is_temporal(type_) for type_ in table.schema.types):
+            return pd.read_csv(file, sep=self.sep, header=None, encoding=self.encoding, low_memory=self.low_memory)
+        # 全为空的列与 pandas 一致为浮点数 NaN
+        table = table.cast(pa.schema([pa.field(field.name, pa.float64()) if pa.types.is_null(field.type) else field for field in table.schema]))
+        content = table.to_pandas()
+        # 与 pandas 无表头读取的列名一致
+        content.columns = range(table.num_columns)
+        return content
 
     def get_content(self, file: str) -> DataFrame | list[DataFrame]:
         """
@@ -66,15 +125,22 @@ class Read:
         if self.is_verbose:
             self.log.debug(f"Start reading {file} file...")
 
-        if str(file).endswith(".txt") or str(file).endswith(".bed") or str(file).endswith(".tsv"):
-            return pd.read_table(file, sep=self.sep, header=self.header, encoding=self.encoding, low_memory=self.low_memory)
-        elif str(file).endswith(".csv"):
-            return pd.read_csv(file, sep=',', header=self.header, encoding=self.encoding, low_memory=self.low_memory)
-        elif str(file).endswith(".xls") or str(file).endswith(".xlsx"):
-            return pd.read_excel(file, sheet_name=self.sheet_name, header=self.header if isinstance(self.header, int) else 0)
-        elif str(file).endswith(".html") or str(file).endswith(".htm"):
+        file_name: str = os.fspath(file).lower()
+        if file_name.endswith(".bed") and self.header is None and self.use_arrow and is_pyarrow and len(self.sep) == 1:
+            try:
+                return self.read_bed(file)
+            except pa.ArrowInvalid:
+                # 前三列的内容与固定类型不符 (例如 start, end 不是整数) 时使用通用的读取方式; track, browser 等注释行不在此处理
+                return self.read_text(file, self.sep)
+        elif file_name.endswith((".txt", ".bed", ".tsv")):
+            return self.read_text(file, self.sep)
+        elif file_name.endswith(".csv"):
+            return self.read_text(file, ',')
+        elif file_name.endswith((".xls", ".xlsx")):
+            return pd.read_excel(file, sheet_name=self.sheet_name, header=self.excel_header)
+        elif file_name.endswith((".html", ".htm")):
             return pd.read_html(file, encoding=self.encoding)
-        elif str(file).endswith(".json"):
+        elif file_name.endswith(".json"):
             return pd.read_json(file, orient=self.orient, lines=self.lines, encoding=self.encoding)
 
     def read_file(self, *files) -> list[DataFrame]:
@@ -83,12 +149,13 @@ class Read:
         :param files:
         :return:
         """
-        files_return = []
-        for file in files:
-            files_return.append(self.get_content(file))
-        return files_return
+        # 解析时会释放 GIL, 多个文件使用线程并行读取
+        if self.parallel and len(files) > 1:
+            with ThreadPoolExecutor(max_workers=min(len(files), os.cpu_count() or 4)) as executor:
+                return list(executor.map(self.get_content, files))
+        return [self.get_content(file) for file in files]
 
-    def file_concat_output(self, *files, output_file, join="inner", index=False, encoding="utf_8_sig") -> None:
+    def file_concat_output(self, *files, output_file, join="inner", index=False, encoding="utf_8_sig", chunksize: int = 65536) -> None:
         """
         Merge two files and export the file
         :param files:
@@ -96,12 +163,54 @@ class Read:
         :param join: How to merge files
         :param index:
         :param encoding: Encoding of output files
+        :param chunksize: Number of rows read at a time when merging text files (values of text files are copied as they are written, without type conversion)
         :return:
         """
-        file_content = self.read_file(*files)
+        if join not in ("inner", "outer"):
+            self.log.error(f"join input error, join is inner or outer, not {join}")
+            raise ValueError(f"join input error, join is inner or outer, not {join}")
+
+        # 分隔符, 非文本文件为 None
+        file_names: list = [os.fspath(file).lower() for file in files]
+        seps: list = [
+            self.sep if file_name.endswith((".txt", ".bed", ".tsv")) else ',' if file_name.endswith(".csv") else None
+            for file_name in file_names
+        ]
+
+        if None in seps:
+            file_content = self.read_file(*files)
+
+            if self.is_verbose:
+                self.log.debug(f"Start merging files {files} ...")
+
+            pd_concat = pd.concat(file_content, join=join, ignore_index=True)
+            pd.DataFrame(pd_concat).to_csv(output_file, encoding=encoding, sep=self.sep, index=index)
+            return
 
         if self.is_verbose:
             self.log.debug(f"Start merging files {files} ...")
 
-        pd_concat = pd.concat(file_content, join=join, ignore_index=True)
-        pd.DataFrame(pd_concat).to_csv(output_file, encoding=encoding, sep=self.sep, index=index)
+        # 先读取表头确定输出的列
+        files_columns: list = [
+            list(pd.read_csv(file, sep=sep, header=self.header, encoding=self.encoding, nrows=0).columns)
+            for file, sep in zip(files, seps)
+        ]
+        columns: list = []
+        for file_columns in files_columns:
+            columns.extend(column for column in file_columns if column not in columns)
+        if join == "inner":
+            columns = [column for column in columns if all(column in file_columns for file_columns in files_columns)]
+
+        # 按块读取并写出, 避免全部文件同时加载到内存
+        # 按字符串读取, 避免每块单独推断类型导致同一列的格式不一致
+        start: int = 0
+        is_header: bool = False
+        with open(output_file, "w", encoding=encoding, newline="") as w:
+            for file, sep in zip(files, seps):
+                chunks = pd.read_csv(file, sep=sep, header=self.header, encoding=self.encoding, dtype=str, keep_default_na=False, chunksize=chunksize)
+                for chunk in chunks:
+                    chunk = chunk.reindex(columns=columns)
+                    chunk.index = pd.RangeIndex(start, start + len(chunk))
+                    chunk.to_csv(w, sep=self.sep, index=index, header=not is_header)
+                    is_header = True
+                    start += len(chunk)
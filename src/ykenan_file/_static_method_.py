@@ -7,6 +7,9 @@ from ykenan_log import Logger
 import gzip
 import os
 import shutil
+import time
+from collections import OrderedDict
+from typing import Iterator
 from multiprocessing.dummy import Lock
 
 '''
@@ -15,6 +18,14 @@ from multiprocessing.dummy import Lock
 '''
 
 
+# 目录扫描缓存: key 为 (path, st_dev, st_ino, st_mtime_ns)
+_scan_cache: OrderedDict = OrderedDict()
+_scan_cache_lock = Lock()
+# 最多缓存的目录数和单个目录的最大条目数
+_scan_cache_size: int = 256
+_scan_cache_entries: int = 1024
+
+
 class StaticMethod:
     """
     文件或者路径的静态方法
@@ -43,18 +54,11 @@ class StaticMethod:
         :param encoding:
         :return:
         """
-        content = []
-
         if self.is_verbose:
             self.log.info(f"Start reading file {path}")
 
         with open(path, mode, encoding=encoding) as f:
-            while True:
-                line = f.readline().strip()
-                content.append(line)
-                if not line:
-                    break
-        return content
+            return [line.strip() for line in f.read().splitlines()]
 
     def write_file_line(self, path: str, content: list, line: str = '\n', mode: str = 'a', encoding: str = "utf-8") -> None:
         """
@@ -70,8 +74,10 @@ class StaticMethod:
             self.log.info(f"Start writing file {path}")
 
         with open(path, mode, encoding=encoding) as f:
-            for li in content:
-                f.write(li + line)
+            # Series, ndarray 和生成器统一转为 list 再判断是否为空
+            content = list(content)
+            if len(content) != 0:
+                f.write(line.join(content) + line)
 
     def read_write_line(
         self,
@@ -82,7 +88,9 @@ class StaticMethod:
         om: str = 'w',
         encoding: str = "utf-8",
         buffering: int = 256,
-        newline: str = "\n"
+        newline: str = "\n",
+        block_size: int = 4 << 20,
+        callback_batch=None
     ) -> None:
         """
         Write one file to another
@@ -95,6 +103,8 @@ class StaticMethod:
         :param encoding: encoding
         :param buffering: Number of loaded lines in the output file
         :param newline: The newline character of the output file
+        :param block_size: Number of characters read from the input file at a time
+        :param callback_batch: A callback function that converts a list of input lines into a list of output data, used instead of `callback`
         :return:
         """
         with open(output, om, encoding=encoding, buffering=buffering, newline=newline) as w:
@@ -106,14 +116,55 @@ class StaticMethod:
                         self.log.debug(f"Add Column Name: {name}")
 
                     w.write(f"{name}\n")
+
+                def write_lines(lines: list) -> None:
+                    lines = [line for line in map(str.strip, lines) if line]
+                    new_lines = callback_batch(lines) if callback_batch is not None else map(callback, lines)
+                    w.writelines(["\t".join(new_line) + "\n" for new_line in new_lines if new_line])
+
+                # 按块读取, 最后一个不完整的行留到下一块处理
+                rest: str = ""
                 while True:
-                    line: str = f.readline().strip()
-                    if not line:
+                    block: str = f.read(block_size)
+                    if not block:
                         break
-                    new_line: list = callback(line)
-                    if new_line and len(new_line) != 0 and new_line != "":
-                        content = "\t".join(new_line)
-                        w.write(f"{content}\n")
+                    lines: list = (rest + block).split("\n")
+                    rest = lines.pop()
+                    write_lines(lines)
+                if rest:
+                    write_lines([rest])
+
+    @staticmethod
+    def _scan(path: str) -> tuple:
+        """
+        Scan the specified path once
+        :param path: path
+        :return: (name, path, is_file, is_dir) of each file and folder
+        """
+        stat = os.stat(path)
+        key: tuple = (os.fspath(path), stat.st_dev, stat.st_ino, stat.st_mtime_ns)
+        with _scan_cache_lock:
+            entries = _scan_cache.get(key)
+            if entries is not None:
+                _scan_cache.move_to_end(key)
+                return entries
+
+        is_symlink: bool = False
+        with os.scandir(path) as it:
+            scanned: list = []
+            for entry in it:
+                is_symlink = is_symlink or entry.is_symlink()
+                scanned.append((entry.name, entry.path, entry.is_file(), entry.is_dir()))
+        entries = tuple(scanned)
+
+        # 添加或删除内容会更新文件夹的修改时间, 以下情况不缓存:
+        # 刚修改过的文件夹 (时间精度不足), 含有符号链接 (目标变化不会更新文件夹的修改时间), 条目过多 (占用内存)
+        if time.time_ns() - stat.st_mtime_ns >= 2_000_000_000 and not is_symlink and len(entries) <= _scan_cache_entries:
+            with _scan_cache_lock:
+                _scan_cache[key] = entries
+                if len(_scan_cache) > _scan_cache_size:
+                    _scan_cache.popitem(last=False)
+        return entries
 
     def get_contents(self, path: str) -> list[str]:
         """
@@ -123,7 +174,7 @@ class StaticMethod:
         """
         if self.is_verbose:
             self.log.info(f"Starting to retrieve content under this path: {path}")
-        return list(os.listdir(path))
+        return [name for name, _, _, _ in self._scan(path)]
 
     def entry_contents(self, path: str, type_: int = 0) -> list[str]:
         """
@@ -135,19 +186,9 @@ class StaticMethod:
         if self.is_verbose:
             self.log.info(f"Starting to retrieve content under this path: {path}")
 
-        contents: list = []
-        with os.scandir(path) as it:
-            for entry in it:
-                entry: os.DirEntry
-                if type_ == 0:
-                    contents.append(entry.name)
-                elif type_ == 1 and entry.is_file():
-                    contents.append(entry.name)
-                elif type_ == 2 and entry.is_dir():
-                    contents.append(entry.name)
-                else:
-                    raise ValueError("type input error, type is 0 or 1 or 2.")
-        return contents
+        if type_ not in (0, 1, 2):
+            raise ValueError("type input error, type is 0 or 1 or 2.")
+        return [name for name, _, is_file, is_dir in self._scan(path) if type_ == 0 or (is_file if type_ == 1 else is_dir)]
 
     def entry_contents_path(self, path: str, type_: int = 0) -> list[str]:
         """
@@ -159,21 +200,9 @@ class StaticMethod:
         if self.is_verbose:
             self.log.info(f"Starting to retrieve content under this path: {path}")
 
-        contents: list = []
-        with os.scandir(path) as it:
-            for entry in it:
-                entry: os.DirEntry
-                if type_ == 0:
-                    contents.append(entry.path)
-                elif type_ == 1:
-                    if entry.is_file():
-                        contents.append(entry.path)
-                elif type_ == 2:
-                    if entry.is_dir():
-                        contents.append(entry.path)
-                else:
-                    raise ValueError("type input error, type is 0 or 1 or 2.")
-        return contents
+        if type_ not in (0, 1, 2):
+            raise ValueError("type input error, type is 0 or 1 or 2.")
+        return [path_ for _, path_, is_file, is_dir in self._scan(path) if type_ == 0 or (is_file if type_ == 1 else is_dir)]
 
     def get_files(self, path: str) -> list[str]:
         """
@@ -183,14 +212,7 @@ class StaticMethod:
         """
         if self.is_verbose:
             self.log.info(f"Starting to retrieve content under this path: {path}")
-
-        files: list = []
-        with os.scandir(path) as it:
-            for entry in it:
-                entry: os.DirEntry
-                if entry.is_file():
-                    files.append(entry.name)
-        return files
+        return [name for name, _, is_file, _ in self._scan(path) if is_file]
 
     def get_files_path(self, path: str) -> list[str]:
         """
@@ -198,16 +220,23 @@ class StaticMethod:
         :param path:  path
         :return: files
         """
+        if self.is_verbose:
+            self.log.info(f"Starting to retrieve content under this path: {path}")
+        return [path_ for _, path_, is_file, _ in self._scan(path) if is_file]
+
+    def iter_files_path(self, path: str) -> Iterator[str]:
+        """
+        Lazily obtain all files in the specified path
+        :param path:  path
+        :return: files
+        """
         if self.is_verbose:
             self.log.info(f"Starting to retrieve content under this path: {path}")
 
-        files: list = []
         with os.scandir(path) as it:
             for entry in it:
-                entry: os.DirEntry
                 if entry.is_file():
-                    files.append(entry.path)
-        return files
+                    yield entry.path
 
     def get_dirs(self, path: str) -> list[str]:
         """
@@ -217,14 +246,7 @@ class StaticMethod:
         """
         if self.is_verbose:
             self.log.info(f"Starting to retrieve content under this path: {path}")
-
-        dirs: list = []
-        with os.scandir(path) as it:
-            for entry in it:
-                entry: os.DirEntry
-                if entry.is_dir():
-                    dirs.append(entry.name)
-        return dirs
+        return [name for name, _, _, is_dir in self._scan(path) if is_dir]
 
     def get_dirs_path(self, path: str) -> list[str]:
         """
@@ -232,16 +254,23 @@ class StaticMethod:
         :param path: path
         :return: dirs
         """
+        if self.is_verbose:
+            self.log.info(f"Starting to retrieve content under this path: {path}")
+        return [path_ for _, path_, _, is_dir in self._scan(path) if is_dir]
+
+    def iter_dirs_path(self, path: str) -> Iterator[str]:
+        """
+        Lazily obtain all folders in the specified path
+        :param path: path
+        :return: dirs
+        """
         if self.is_verbose:
             self.log.info(f"Starting to retrieve content under this path: {path}")
 
-        dirs: list = []
         with os.scandir(path) as it:
             for entry in it:
-                entry: os.DirEntry
                 if entry.is_dir():
-                    dirs.append(entry.path)
-        return dirs
+                    yield entry.path
 
     def entry_contents_dict(self, path: str, type_: int = 0, suffix: str = None) -> dict:
         """
@@ -254,30 +283,17 @@ class StaticMethod:
         if self.is_verbose:
             self.log.info(f"Starting to retrieve content under this path: {path}")
 
-        files: list = []
-        dirs: list = []
-        contents: list = []
+        if type_ not in (0, 1, 2):
+            raise ValueError("type input error, type is 0 or 1 or 2.")
+
+        names: list = []
         dict_: dict = {}
-        with os.scandir(path) as it:
-            for entry in it:
-                entry: os.DirEntry
-                # 判断是否满足情况
-                if suffix is None or entry.name.endswith(suffix):
-                    if type_ == 0:
-                        contents.append(entry.name)
-                        dict_.update({entry.name: entry.path})
-                    elif type_ == 1:
-                        # 此处判断不能和 type_ == 1 连写，因为需要进行提示 ValueError("type input error, type is 0 or 1 or 2.")
-                        if entry.is_file():
-                            files.append(entry.name)
-                            dict_.update({entry.name: entry.path})
-                    elif type_ == 2:
-                        if entry.is_dir():
-                            dirs.append(entry.name)
-                            dict_.update({entry.name: entry.path})
-                    else:
-                        raise ValueError("type input error, type is 0 or 1 or 2.")
-        dict_.update({"name": contents if type_ == 0 else files if type_ == 1 else dirs})
+        for name, path_, is_file, is_dir in self._scan(path):
+            # 判断是否满足情况
+            if (suffix is None or name.endswith(suffix)) and (type_ == 0 or (is_file if type_ == 1 else is_dir)):
+                names.append(name)
+                dict_[name] = path_
+        dict_["name"] = names
         return dict_
 
     def entry_files_dict(self, path: str) -> dict: